@@ -0,0 +1,426 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keeps part numbers and error codes such as "AB-1234" or "0x8007.0005" intact
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./:]\w+)*")
+SPLIT_PATTERN = re.compile(r"[-./:]")
+
+BASE_MAGIC = b"BM25"
+LOG_MAGIC = b"BMLG"
+FORMAT_VERSION = 2
+
+
+class CorpusStatistics(NamedTuple):
+    """Collection statistics BM25 needs, restricted to a query's terms"""
+    num_chunks: int
+    total_length: int
+    document_frequencies: Dict[str, int]
+
+
+def combine_statistics(statistics: Iterable[CorpusStatistics]) -> CorpusStatistics:
+    """Sum statistics from several indexes so their BM25 scores share one scale"""
+    num_chunks = 0
+    total_length = 0
+    document_frequencies: Dict[str, int] = {}
+    for stats in statistics:
+        num_chunks += stats.num_chunks
+        total_length += stats.total_length
+        for term, df in stats.document_frequencies.items():
+            document_frequencies[term] = document_frequencies.get(term, 0) + df
+    return CorpusStatistics(num_chunks, total_length, document_frequencies)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into index terms.
+
+    Compound tokens are kept whole and their parts are indexed as well, so
+    "ERR-404" matches both "err-404" and "404".
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        parts = SPLIT_PATTERN.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_string(buffer: bytearray, value: str):
+    encoded = value.encode("utf-8")
+    _write_varint(buffer, len(encoded))
+    buffer.extend(encoded)
+
+
+def _read_string(data: bytes, pos: int) -> Tuple[str, int]:
+    length, pos = _read_varint(data, pos)
+    return data[pos:pos + length].decode("utf-8"), pos + length
+
+
+def _split_chunk_id(chunk_id: str) -> Tuple[str, int]:
+    """Split "<document_id>_<i>" into (document_id, i + 1), or (chunk_id, 0) otherwise"""
+    document_id, sep, suffix = chunk_id.rpartition("_")
+    if sep and document_id and suffix.isdigit() and str(int(suffix)) == suffix:
+        return document_id, int(suffix) + 1
+    return chunk_id, 0
+
+
+class LexicalIndex:
+    """Inverted index with BM25 scoring over document chunks.
+
+    Postings are kept in memory. New chunks are appended to a write-ahead
+    log, which is periodically compacted into a base file where every
+    number is a varint, chunk ordinals within a posting list are
+    delta-encoded and each document id is stored once.
+    """
+
+    # Compact once the log holds this many chunks and at least half as many as the base
+    MIN_COMPACTION_CHUNKS = 256
+
+    def __init__(self, path: str = "./lexical_index", k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.file_path = os.path.join(path, "postings.bin")
+        self.log_path = os.path.join(path, "postings.log")
+        self.old_log_path = self.log_path + ".old"
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._compacting = False
+        self._compaction_thread = None
+        self._generation = 0
+        self._reset()
+        self.load()
+
+    def _reset(self):
+        self.chunk_ids: List[str] = []
+        self.chunk_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.total_length = 0
+        self.base_chunks = 0
+        self.log_chunks = 0
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def _index_chunk(self, chunk_id: str, term_counts: Dict[str, int], length: int):
+        ordinal = len(self.chunk_ids)
+        self.chunk_ids.append(chunk_id)
+        self.chunk_lengths.append(length)
+        self.total_length += length
+        for term, tf in term_counts.items():
+            self.postings.setdefault(term, []).append((ordinal, tf))
+
+    def add_chunks(self, chunk_ids: Iterable[str], texts: Iterable[str], persist: bool = True):
+        """Index new chunks and optionally append them to the on-disk log"""
+        batch = []
+        for chunk_id, text in zip(chunk_ids, texts):
+            terms = tokenize(text)
+            batch.append((chunk_id, Counter(terms), len(terms)))
+
+        with self._lock:
+            for chunk_id, term_counts, length in batch:
+                self._index_chunk(chunk_id, term_counts, length)
+            if persist and batch:
+                self._append_log(batch)
+                self.log_chunks += len(batch)
+            needs_compaction = (
+                persist
+                and not self._compacting
+                and self.log_chunks >= self.MIN_COMPACTION_CHUNKS
+                and self.log_chunks * 2 >= self.base_chunks
+            )
+            if needs_compaction:
+                # Compact in the background so callers holding their own locks are not held up
+                self._compacting = True
+                self._compaction_thread = threading.Thread(
+                    target=self.compact, name="lexical-index-compaction", daemon=True
+                )
+                self._compaction_thread.start()
+
+    def _append_log(self, batch: List[Tuple[str, Dict[str, int], int]]):
+        payload = bytearray()
+        _write_varint(payload, len(batch))
+        for chunk_id, term_counts, length in batch:
+            _write_string(payload, chunk_id)
+            _write_varint(payload, length)
+            _write_varint(payload, len(term_counts))
+            for term, tf in term_counts.items():
+                _write_string(payload, term)
+                _write_varint(payload, tf)
+
+        record = bytearray()
+        if not os.path.exists(self.log_path):
+            os.makedirs(self.path, exist_ok=True)
+            record.extend(LOG_MAGIC)
+            record.append(FORMAT_VERSION)
+        _write_varint(record, len(payload))
+        record.extend(payload)
+        with open(self.log_path, "ab") as f:
+            f.write(record)
+
+    def statistics(self, query: str) -> CorpusStatistics:
+        """Return this index's statistics for the terms in query"""
+        with self._lock:
+            return CorpusStatistics(
+                len(self.chunk_ids),
+                self.total_length,
+                {term: len(self.postings.get(term, ())) for term in set(tokenize(query))}
+            )
+
+    def search(self, query: str, n_results: int = 5,
+               statistics: Optional[CorpusStatistics] = None) -> List[Tuple[str, float]]:
+        """Return (chunk_id, bm25_score) pairs ordered by descending score.
+
+        Pass statistics combined across several indexes to score against
+        that shared corpus instead of this index alone.
+        """
+        with self._lock:
+            if not self.chunk_ids:
+                return []
+            if statistics is None:
+                statistics = self.statistics(query)
+            num_chunks = statistics.num_chunks
+            avg_length = statistics.total_length / num_chunks or 1.0
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                df = statistics.document_frequencies.get(term, len(postings))
+                idf = math.log(1 + (num_chunks - df + 0.5) / (df + 0.5))
+                for ordinal, tf in postings:
+                    norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[ordinal] / avg_length)
+                    scores[ordinal] = scores.get(ordinal, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+            return [(self.chunk_ids[ordinal], score) for ordinal, score in ranked]
+
+    def clear(self):
+        """Remove all indexed chunks and the on-disk files"""
+        with self._lock:
+            self._reset()
+            self._generation += 1
+            for path in (self.file_path, self.log_path, self.old_log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def compact(self):
+        """Fold the log into a new base file.
+
+        Posting lists only ever grow, so the base is serialized from a
+        snapshot of their lengths taken under the lock and written outside
+        it; searches and appends only wait for the snapshot, and chunks
+        added meanwhile go to a fresh log. add_chunks triggers this on a
+        background thread; a direct call waits for any running compaction
+        and then compacts synchronously.
+        """
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            self._compacting = True
+            generation = self._generation
+            num_chunks = len(self.chunk_ids)
+            chunk_ids = self.chunk_ids
+            chunk_lengths = self.chunk_lengths
+            snapshot = [(term, postings, len(postings)) for term, postings in self.postings.items()]
+            if os.path.exists(self.log_path):
+                if os.path.exists(self.old_log_path):
+                    # A previous compaction failed; keep its log and add the new records
+                    with open(self.log_path, "rb") as f:
+                        records = f.read()[5:]
+                    with open(self.old_log_path, "ab") as f:
+                        f.write(records)
+                    os.remove(self.log_path)
+                else:
+                    os.replace(self.log_path, self.old_log_path)
+            self.log_chunks = 0
+
+        try:
+            buffer = self._serialize(chunk_ids[:num_chunks], chunk_lengths[:num_chunks], snapshot)
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(buffer)
+
+            with self._lock:
+                if generation == self._generation:
+                    os.replace(tmp_path, self.file_path)
+                    if os.path.exists(self.old_log_path):
+                        os.remove(self.old_log_path)
+                    self.base_chunks = num_chunks
+                else:
+                    # The index was cleared while compacting
+                    os.remove(tmp_path)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _serialize(self, chunk_ids: List[str], chunk_lengths: List[int],
+                   snapshot: List[Tuple[str, List[Tuple[int, int]], int]]) -> bytearray:
+        documents: Dict[str, int] = {}
+        chunks = []
+        for chunk_id in chunk_ids:
+            document_id, suffix = _split_chunk_id(chunk_id)
+            chunks.append((documents.setdefault(document_id, len(documents)), suffix))
+
+        buffer = bytearray(BASE_MAGIC)
+        buffer.append(FORMAT_VERSION)
+        _write_varint(buffer, len(documents))
+        for document_id in documents:
+            _write_string(buffer, document_id)
+        _write_varint(buffer, len(chunks))
+        for (document_ordinal, suffix), length in zip(chunks, chunk_lengths):
+            _write_varint(buffer, document_ordinal)
+            _write_varint(buffer, suffix)
+            _write_varint(buffer, length)
+
+        terms = [(term, postings, df) for term, postings, df in snapshot if df]
+        _write_varint(buffer, len(terms))
+        for term, postings, df in terms:
+            _write_string(buffer, term)
+            _write_varint(buffer, df)
+            previous = 0
+            for ordinal, tf in postings[:df]:
+                _write_varint(buffer, ordinal - previous)
+                _write_varint(buffer, tf)
+                previous = ordinal
+        return buffer
+
+    def load(self):
+        """Load the base file and replay the log, starting empty if the base is unreadable"""
+        with self._lock:
+            self._reset()
+            try:
+                if os.path.exists(self.file_path):
+                    with open(self.file_path, "rb") as f:
+                        self._load_base(f.read())
+                self.base_chunks = len(self.chunk_ids)
+            except Exception as e:
+                logger.warning(f"Could not load lexical index, starting empty: {e}")
+                self._reset()
+                return
+
+            known = set(self.chunk_ids)
+            for path in (self.old_log_path, self.log_path):
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    replayed, valid_length = self._replay_log(data, known)
+                    self.log_chunks += replayed
+                    if valid_length == 0:
+                        os.remove(path)
+                    elif valid_length < len(data):
+                        # Drop a torn tail so later appends stay readable
+                        with open(path, "r+b") as f:
+                            f.truncate(valid_length)
+
+    def _load_base(self, data: bytes):
+        if data[:4] != BASE_MAGIC or data[4] != FORMAT_VERSION:
+            raise ValueError("unrecognized postings file format")
+        pos = 5
+        num_documents, pos = _read_varint(data, pos)
+        documents = []
+        for _ in range(num_documents):
+            document_id, pos = _read_string(data, pos)
+            documents.append(document_id)
+        num_chunks, pos = _read_varint(data, pos)
+        for _ in range(num_chunks):
+            document_ordinal, pos = _read_varint(data, pos)
+            suffix, pos = _read_varint(data, pos)
+            length, pos = _read_varint(data, pos)
+            document_id = documents[document_ordinal]
+            self.chunk_ids.append(f"{document_id}_{suffix - 1}" if suffix else document_id)
+            self.chunk_lengths.append(length)
+        self.total_length = sum(self.chunk_lengths)
+        num_terms, pos = _read_varint(data, pos)
+        for _ in range(num_terms):
+            term, pos = _read_string(data, pos)
+            df, pos = _read_varint(data, pos)
+            postings = []
+            ordinal = 0
+            for _ in range(df):
+                gap, pos = _read_varint(data, pos)
+                tf, pos = _read_varint(data, pos)
+                ordinal += gap
+                postings.append((ordinal, tf))
+            self.postings[term] = postings
+
+    def _replay_log(self, data: bytes, known: set) -> Tuple[int, int]:
+        """Index log records not already in the base.
+
+        Returns the number of chunks replayed and the length of the valid
+        prefix of the log; a torn trailing record is ignored.
+        """
+        if len(data) < 5 or data[:4] != LOG_MAGIC or data[4] != FORMAT_VERSION:
+            logger.warning("Discarding lexical index log with unrecognized format")
+            return 0, 0
+        pos = 5
+        valid_length = pos
+        replayed = 0
+        try:
+            while pos < len(data):
+                record_length, pos = _read_varint(data, pos)
+                if pos + record_length > len(data):
+                    break
+                record = data[pos:pos + record_length]
+                pos += record_length
+
+                batch = []
+                rpos = 0
+                num_chunks, rpos = _read_varint(record, rpos)
+                for _ in range(num_chunks):
+                    chunk_id, rpos = _read_string(record, rpos)
+                    length, rpos = _read_varint(record, rpos)
+                    num_terms, rpos = _read_varint(record, rpos)
+                    term_counts = {}
+                    for _ in range(num_terms):
+                        term, rpos = _read_string(record, rpos)
+                        term_counts[term], rpos = _read_varint(record, rpos)
+                    batch.append((chunk_id, term_counts, length))
+
+                for chunk_id, term_counts, length in batch:
+                    if chunk_id not in known:
+                        known.add(chunk_id)
+                        self._index_chunk(chunk_id, term_counts, length)
+                        replayed += 1
+                valid_length = pos
+        except (IndexError, UnicodeDecodeError):
+            logger.warning("Ignoring truncated lexical index log record")
+        return replayed, valid_length
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several ranked lists of ids into one list of (id, score) pairs"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
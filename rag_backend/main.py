@@ -1,5 +1,6 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import aiofiles
 import os
@@ -11,9 +12,12 @@ from models import (
     DocumentUploadResponse, 
     ChatRequest, 
     ChatResponse, 
+    SearchRequest,
+    SearchResponse,
     HealthCheck
 )
 from rag_service import RAGService
+from workspace import DEFAULT_WORKSPACE, WorkspaceNotFoundError, validate_workspace_name
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -57,9 +61,17 @@ async def health_check():
         raise HTTPException(status_code=500, detail="Health check failed")
 
 @app.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    workspace: str = Query(DEFAULT_WORKSPACE, description="Workspace to add the document to")
+):
     """Upload and process a document"""
     
+    try:
+        validate_workspace_name(workspace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Validate file type
     allowed_extensions = {'.pdf', '.docx', '.pptx'}
     file_extension = Path(file.filename).suffix.lower()
@@ -81,8 +93,10 @@ async def upload_document(file: UploadFile = File(...)):
             content = await file.read()
             temp_file.write(content)
         
-        # Process document with RAG service
-        result = rag_service.add_document(temp_file_path, file.filename)
+        # Process document with RAG service off the event loop so other requests keep flowing
+        result = await run_in_threadpool(
+            rag_service.add_document, temp_file_path, file.filename, workspace=workspace
+        )
         
         return DocumentUploadResponse(**result)
         
@@ -96,42 +110,78 @@ async def upload_document(file: UploadFile = File(...)):
             os.unlink(temp_file_path)
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def chat(request: ChatRequest):
     """Chat endpoint with RAG capabilities"""
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
     try:
-        if not request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
+        for workspace in request.workspaces:
+            rag_service.get_workspace(workspace)
         
         response = rag_service.generate_response(request)
         return response
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
-@app.delete("/documents")
-async def clear_documents():
-    """Clear all documents from the vector database"""
+@app.post("/search", response_model=SearchResponse)
+def search(request: SearchRequest):
+    """Search documents without generating a response"""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
     try:
-        # Delete the collection and recreate it
-        rag_service.chroma_client.delete_collection("documents")
-        rag_service.collection = rag_service.chroma_client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
+        results = rag_service.search_documents(
+            request.query,
+            n_results=request.n_results,
+            search_mode=request.search_mode,
+            workspaces=request.workspaces
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return SearchResponse(results=results)
+
+@app.get("/workspaces")
+def list_workspaces():
+    """List all workspaces"""
+    try:
+        return {"workspaces": rag_service.list_workspaces()}
+        
+    except Exception as e:
+        logger.error(f"Error listing workspaces: {e}")
+        raise HTTPException(status_code=500, detail=f"Error listing workspaces: {str(e)}")
+
+@app.delete("/documents")
+def clear_documents(workspace: str = Query(DEFAULT_WORKSPACE, description="Workspace to clear")):
+    """Clear all documents from a workspace's vector database"""
+    try:
+        rag_service.clear_workspace(workspace)
         
-        return {"message": "All documents cleared successfully"}
+        return {"message": f"All documents in workspace '{workspace}' cleared successfully"}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error clearing documents: {e}")
         raise HTTPException(status_code=500, detail=f"Error clearing documents: {str(e)}")
 
 @app.get("/documents")
-async def list_documents():
-    """List all documents in the database"""
+def list_documents(workspace: str = Query(DEFAULT_WORKSPACE, description="Workspace to list")):
+    """List all documents in a workspace"""
     try:
         # Get all documents from collection
-        results = rag_service.collection.get()
+        results = rag_service.get_workspace(workspace).collection.get()
         
         # Extract unique documents
         documents = {}
@@ -148,8 +198,12 @@ async def list_documents():
                 if doc_id:
                     documents[doc_id]['chunks'] += 1
         
-        return {"documents": list(documents.values())}
+        return {"workspace": workspace, "documents": list(documents.values())}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkspaceNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
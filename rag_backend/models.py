@@ -1,11 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from typing import List, Optional, Union, Literal
 from datetime import datetime
 
 class DocumentUploadResponse(BaseModel):
     success: bool
     message: str
     document_id: Optional[str] = None
+    workspace: Optional[str] = None
     filename: str
     file_type: str
     chunks_created: Optional[int] = None
@@ -20,6 +21,8 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User's text query")
     image_data: Optional[str] = Field(None, description="Base64 encoded image data")
     conversation_history: List[ChatMessage] = Field(default_factory=list)
+    search_mode: Literal["vector", "lexical", "hybrid"] = Field("vector", description="Retrieval strategy for context")
+    workspaces: List[str] = Field(default_factory=lambda: ["default"], description="Workspaces to search for context")
 
 class ChatResponse(BaseModel):
     response: str
@@ -37,6 +40,15 @@ class SearchResult(BaseModel):
     metadata: dict
     similarity_score: float
 
+class SearchRequest(BaseModel):
+    query: str = Field(..., description="Search query")
+    n_results: int = Field(5, ge=1, le=100, description="Number of results to return")
+    search_mode: Literal["vector", "lexical", "hybrid"] = Field("vector", description="Retrieval strategy")
+    workspaces: List[str] = Field(default_factory=lambda: ["default"], description="Workspaces to search in parallel")
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult] = Field(default_factory=list)
+
 class HealthCheck(BaseModel):
     status: str
     ollama_status: str
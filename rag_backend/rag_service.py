@@ -1,11 +1,21 @@
 import os
 import uuid
+import threading
 import ollama
 import chromadb
 from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 from sentence_transformers import SentenceTransformer
 from models import DocumentChunk, SearchResult, ChatRequest, ChatResponse
 from document_processor import DocumentProcessor
+from workspace import (
+    DEFAULT_WORKSPACE,
+    Workspace,
+    WorkspaceNotFoundError,
+    validate_workspace_name,
+    workspace_names,
+    search_workspaces
+)
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -21,10 +31,13 @@ class RAGService:
             path="./chroma_db",
             settings=chromadb.Settings(anonymized_telemetry=False)
         )
-        self.collection = self.chroma_client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        
+        # Workspaces are opened lazily; cross-workspace searches fan out on this pool
+        self.workspaces: Dict[str, Workspace] = {}
+        self._workspaces_lock = threading.Lock()
+        self._opening_locks: Dict[str, threading.Lock] = {}
+        self.search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="workspace-search")
+        self.get_workspace(DEFAULT_WORKSPACE, create=True)
         
         # Initialize document processor
         self.doc_processor = DocumentProcessor()
@@ -46,6 +59,47 @@ class RAGService:
         except Exception as e:
             raise Exception(f"Ollama embedding model not available: {e}")
     
+    def get_workspace(self, name: str = DEFAULT_WORKSPACE, create: bool = False) -> Workspace:
+        """Return the workspace with the given name
+        
+        Only existing workspaces are opened unless create is set, so read
+        paths never leave new collections behind.
+        """
+        validate_workspace_name(name)
+        workspace = self.workspaces.get(name)
+        if workspace is not None:
+            return workspace
+        
+        if not create and name not in self.list_workspaces():
+            raise WorkspaceNotFoundError(f"Workspace '{name}' not found")
+        
+        # Open under a per-name lock so a slow open (e.g. an index rebuild)
+        # never holds up requests to other workspaces
+        with self._workspaces_lock:
+            opening_lock = self._opening_locks.setdefault(name, threading.Lock())
+        with opening_lock:
+            workspace = self.workspaces.get(name)
+            if workspace is None:
+                workspace = Workspace(name, self.chroma_client)
+                self.workspaces[name] = workspace
+            return workspace
+    
+    def list_workspaces(self) -> List[str]:
+        """List the names of all workspaces that have a collection"""
+        return workspace_names(self.chroma_client)
+    
+    def clear_workspace(self, name: str = DEFAULT_WORKSPACE):
+        """Delete all documents in a single workspace"""
+        workspace = self.get_workspace(name)
+        with workspace.write_lock:
+            # Delete the collection and recreate it
+            self.chroma_client.delete_collection(workspace.collection_name)
+            workspace.collection = self.chroma_client.get_or_create_collection(
+                name=workspace.collection_name,
+                metadata={"hnsw:space": "cosine"}
+            )
+            workspace.lexical_index.clear()
+    
     def get_embedding(self, text: str) -> List[float]:
         """Generate embedding for text"""
         try:
@@ -61,9 +115,11 @@ class RAGService:
                 self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
             return self.embedding_model.encode(text).tolist()
     
-    def add_document(self, file_path: str, filename: str) -> Dict[str, Any]:
-        """Process and add document to vector database"""
+    def add_document(self, file_path: str, filename: str, workspace: str = DEFAULT_WORKSPACE) -> Dict[str, Any]:
+        """Process and add document to a workspace's vector database"""
         try:
+            target = self.get_workspace(workspace, create=True)
+            
             # Process document
             chunks, file_type = self.doc_processor.process_document(file_path, filename)
             
@@ -82,23 +138,28 @@ class RAGService:
                 chunk_id = f"{document_id}_{i}"
                 embedding = self.get_embedding(chunk)
                 
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[{
-                        "document_id": document_id,
-                        "filename": filename,
-                        "file_type": file_type,
-                        "chunk_index": i,
-                        "chunk_id": chunk_id
-                    }],
-                    ids=[chunk_id]
-                )
+                with target.write_lock:
+                    target.collection.add(
+                        embeddings=[embedding],
+                        documents=[chunk],
+                        metadatas=[{
+                            "document_id": document_id,
+                            "filename": filename,
+                            "file_type": file_type,
+                            "chunk_index": i,
+                            "chunk_id": chunk_id,
+                            "workspace": target.name
+                        }],
+                        ids=[chunk_id]
+                    )
+                    # Index each chunk as it is written so a failure leaves both stores in step
+                    target.lexical_index.add_chunks([chunk_id], [chunk])
             
             return {
                 "success": True,
                 "message": f"Document processed successfully",
                 "document_id": document_id,
+                "workspace": target.name,
                 "filename": filename,
                 "file_type": file_type,
                 "chunks_created": len(chunks)
@@ -113,27 +174,25 @@ class RAGService:
                 "file_type": "unknown"
             }
     
-    def search_documents(self, query: str, n_results: int = 5) -> List[SearchResult]:
-        """Search for relevant documents"""
+    def search_documents(self, query: str, n_results: int = 5, search_mode: str = "vector",
+                         workspaces: List[str] = None) -> List[SearchResult]:
+        """Search for relevant documents
+        
+        search_mode is "vector" (embedding similarity), "lexical" (BM25 only,
+        no embedding call) or "hybrid" (both, fused with reciprocal rank fusion).
+        When several workspaces are given they are searched in parallel and
+        the top n_results across all of them are returned.
+        """
+        targets = [self.get_workspace(name) for name in workspaces or [DEFAULT_WORKSPACE]]
+        
         try:
-            query_embedding = self.get_embedding(query)
+            # Embed once up front so parallel workspace searches share it
+            query_embedding = self.get_embedding(query) if search_mode != "lexical" else None
             
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
+            return search_workspaces(
+                targets, query, query_embedding, n_results, search_mode, executor=self.search_executor
             )
             
-            search_results = []
-            if results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
-                    search_results.append(SearchResult(
-                        content=results['documents'][0][i],
-                        metadata=results['metadatas'][0][i],
-                        similarity_score=1 - results['distances'][0][i]  # Convert distance to similarity
-                    ))
-            
-            return search_results
-            
         except Exception as e:
             logger.error(f"Error searching documents: {e}")
             return []
@@ -142,7 +201,11 @@ class RAGService:
         """Generate response using RAG"""
         try:
             # Search for relevant documents
-            search_results = self.search_documents(request.message)
+            search_results = self.search_documents(
+                request.message,
+                search_mode=request.search_mode,
+                workspaces=request.workspaces
+            )
             
             # Prepare context from search results
             context = ""
@@ -0,0 +1,143 @@
+"""
+Tests for the BM25 lexical index and its on-disk format
+"""
+
+import os
+
+from lexical_index import LexicalIndex, combine_statistics, reciprocal_rank_fusion, tokenize
+
+
+def build_index(path):
+    index = LexicalIndex(path=str(path))
+    index.add_chunks(
+        ["doc1_0", "doc1_1", "doc2_0", "custom-id"],
+        [
+            "Pump AB-1234 reported error ERR-404 during startup",
+            "The pump runs fine after the filter was replaced",
+            "Unrelated maintenance notes for valve ERR-500",
+            "Filter replacement schedule for the pump",
+        ],
+    )
+    return index
+
+
+def test_tokenize_keeps_compound_tokens_and_parts():
+    assert tokenize("See ERR-404") == ["see", "err-404", "err", "404"]
+
+
+def test_bm25_ranks_exact_code_first(tmp_path):
+    index = build_index(tmp_path)
+
+    results = index.search("ERR-404")
+
+    assert results[0][0] == "doc1_0"
+    assert all(score > 0 for _, score in results)
+    assert index.search("nonexistent") == []
+
+
+def test_bm25_prefers_rarer_terms(tmp_path):
+    index = build_index(tmp_path)
+
+    # "valve" appears in one chunk, "pump" in three
+    assert index.search("pump valve")[0][0] == "doc2_0"
+
+
+def test_combined_statistics_match_single_index(tmp_path):
+    chunks = build_index(tmp_path / "all")
+    first = LexicalIndex(path=str(tmp_path / "first"))
+    second = LexicalIndex(path=str(tmp_path / "second"))
+    first.add_chunks(["doc1_0", "doc1_1"], [
+        "Pump AB-1234 reported error ERR-404 during startup",
+        "The pump runs fine after the filter was replaced",
+    ])
+    second.add_chunks(["doc2_0", "custom-id"], [
+        "Unrelated maintenance notes for valve ERR-500",
+        "Filter replacement schedule for the pump",
+    ])
+
+    query = "pump filter"
+    statistics = combine_statistics([first.statistics(query), second.statistics(query)])
+    merged = sorted(
+        first.search(query, statistics=statistics) + second.search(query, statistics=statistics),
+        key=lambda hit: hit[1],
+        reverse=True
+    )
+
+    assert statistics.num_chunks == 4
+    assert [chunk_id for chunk_id, _ in merged] == [chunk_id for chunk_id, _ in chunks.search(query)]
+    for (_, merged_score), (_, score) in zip(merged, chunks.search(query)):
+        assert abs(merged_score - score) < 1e-9
+
+
+def test_log_replay_round_trip(tmp_path):
+    index = build_index(tmp_path)
+
+    reloaded = LexicalIndex(path=str(tmp_path))
+
+    assert len(reloaded) == 4
+    assert reloaded.search("pump filter") == index.search("pump filter")
+
+
+def test_compacted_round_trip(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    index.add_chunks(["doc3_0"], ["Pump ERR-404 again"])
+
+    assert not os.path.exists(index.old_log_path)
+    reloaded = LexicalIndex(path=str(tmp_path))
+
+    assert reloaded.chunk_ids == index.chunk_ids
+    assert reloaded.search("ERR-404 pump") == index.search("ERR-404 pump")
+
+
+def test_background_compaction(tmp_path):
+    index = LexicalIndex(path=str(tmp_path))
+    count = LexicalIndex.MIN_COMPACTION_CHUNKS
+    for i in range(count):
+        index.add_chunks([f"doc{i}_0"], [f"widget {i} ERR-{i}"])
+
+    index._compaction_thread.join()
+
+    assert index.base_chunks == count
+    assert os.path.getsize(index.file_path) > 0
+    reloaded = LexicalIndex(path=str(tmp_path))
+    assert len(reloaded) == count
+    assert reloaded.search("ERR-7") == index.search("ERR-7")
+
+
+def test_torn_log_tail_is_dropped(tmp_path):
+    build_index(tmp_path)
+    log_path = os.path.join(str(tmp_path), "postings.log")
+    with open(log_path, "ab") as f:
+        f.write(b"\x7f\x01")
+
+    reloaded = LexicalIndex(path=str(tmp_path))
+    reloaded.add_chunks(["doc3_0"], ["fresh chunk"])
+
+    assert len(LexicalIndex(path=str(tmp_path))) == 5
+
+
+def test_corrupt_base_starts_empty(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    with open(index.file_path, "wb") as f:
+        f.write(b"garbage")
+
+    assert len(LexicalIndex(path=str(tmp_path))) == 0
+
+
+def test_clear_removes_files(tmp_path):
+    index = build_index(tmp_path)
+    index.compact()
+    index.add_chunks(["doc3_0"], ["more text"])
+
+    index.clear()
+
+    assert len(index) == 0
+    assert len(LexicalIndex(path=str(tmp_path))) == 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "d"]])
+
+    assert [item_id for item_id, _ in fused][:2] == ["b", "c"]
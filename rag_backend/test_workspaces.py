@@ -0,0 +1,175 @@
+"""
+Tests for workspace naming and cross-workspace search, using an in-memory
+stand-in for the Chroma client
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from workspace import (
+    DEFAULT_WORKSPACE,
+    Workspace,
+    collection_name,
+    search_workspaces,
+    validate_workspace_name,
+    workspace_names,
+)
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.embeddings = []
+
+    def add(self, embeddings, documents, metadatas, ids):
+        self.embeddings.extend(embeddings)
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, ids=None, include=None):
+        positions = [self.ids.index(i) for i in ids if i in self.ids] if ids is not None else range(len(self.ids))
+        return {
+            "ids": [self.ids[p] for p in positions],
+            "documents": [self.documents[p] for p in positions],
+            "metadatas": [dict(self.metadatas[p]) for p in positions],
+        }
+
+    def query(self, query_embeddings, n_results):
+        query = query_embeddings[0]
+        distances = [1 - _cosine(query, embedding) for embedding in self.embeddings]
+        order = sorted(range(len(self.ids)), key=lambda p: distances[p])[:n_results]
+        return {
+            "ids": [[self.ids[p] for p in order]],
+            "documents": [[self.documents[p] for p in order]],
+            "metadatas": [[dict(self.metadatas[p]) for p in order]],
+            "distances": [[distances[p] for p in order]],
+        }
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def list_collections(self):
+        return list(self.collections.values())
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+def add_chunks(workspace, chunks):
+    for chunk_id, text, embedding in chunks:
+        workspace.collection.add(
+            embeddings=[embedding],
+            documents=[text],
+            metadatas=[{"chunk_id": chunk_id, "filename": f"{chunk_id}.pdf"}],
+            ids=[chunk_id],
+        )
+        workspace.lexical_index.add_chunks([chunk_id], [text])
+
+
+@pytest.fixture
+def workspaces(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = FakeClient()
+    manuals = Workspace("manuals", client)
+    tickets = Workspace("tickets", client)
+    # "manuals" is large and mentions the pump everywhere; only one chunk has the error code
+    add_chunks(manuals, [
+        ("m_0", "pump ERR-404 wiring diagram", [1.0, 0.0]),
+    ] + [
+        (f"m_{i}", f"pump maintenance step {i}", [0.6, 0.8]) for i in range(1, 20)
+    ])
+    # "tickets" is tiny and only shares the common word
+    add_chunks(tickets, [
+        ("t_0", "the pump is noisy", [0.0, 1.0]),
+        ("t_1", "printer jam on floor two", [0.8, 0.6]),
+    ])
+    return manuals, tickets
+
+
+@pytest.mark.parametrize("name", ["a", "default", "team-a", "team_a", "a" * 48, "0x1"])
+def test_valid_workspace_names(name):
+    validate_workspace_name(name)
+
+
+@pytest.mark.parametrize("name", ["", "a" * 49, "-team", "team-", "_team", "team_", "Team", "te am", "a/b"])
+def test_invalid_workspace_names(name):
+    with pytest.raises(ValueError):
+        validate_workspace_name(name)
+
+
+def test_workspace_names_map_collections():
+    client = FakeClient()
+    for name in ["documents", "documents_team-a", "documents_tickets", "unrelated"]:
+        client.get_or_create_collection(name)
+
+    assert workspace_names(client) == [DEFAULT_WORKSPACE, "team-a", "tickets"]
+    assert collection_name(DEFAULT_WORKSPACE) == "documents"
+    assert collection_name("team-a") == "documents_team-a"
+
+
+def test_vector_merge_sorts_by_cosine_and_cuts_top_k(workspaces):
+    manuals, tickets = workspaces
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = search_workspaces([manuals, tickets], "", [1.0, 0.0], 3, "vector", executor)
+
+    scores = [result.similarity_score for result in results]
+    assert len(results) == 3
+    assert scores == sorted(scores, reverse=True)
+    assert results[0].metadata["chunk_id"] == "m_0"
+    assert results[1].metadata["chunk_id"] == "t_1"
+    assert results[1].metadata["workspace"] == "tickets"
+
+
+def test_lexical_merge_uses_shared_statistics(workspaces):
+    manuals, tickets = workspaces
+
+    results = search_workspaces([manuals, tickets], "the pump ERR-404", None, 5, "lexical")
+
+    # A common word in a tiny workspace must not outrank the chunk with the exact code
+    assert results[0].metadata["chunk_id"] == "m_0"
+    assert len(results) == 5
+
+    # Workspaces do not take turns: a weak match in "tickets" loses to better ones in "manuals"
+    results = search_workspaces([manuals, tickets], "pump maintenance", None, 5, "lexical")
+    assert all(result.metadata["workspace"] == "manuals" for result in results)
+
+
+def test_scores_do_not_depend_on_workspace_count(workspaces):
+    manuals, tickets = workspaces
+
+    alone = search_workspaces([manuals], "pump ERR-404", None, 1, "lexical")
+    together = search_workspaces([manuals, tickets], "pump ERR-404", None, 1, "lexical")
+
+    assert alone[0].metadata["chunk_id"] == together[0].metadata["chunk_id"] == "m_0"
+    # Both are BM25 scores: adding a workspace only shifts corpus statistics slightly
+    assert together[0].similarity_score > 1
+    assert abs(alone[0].similarity_score - together[0].similarity_score) < alone[0].similarity_score / 2
+
+
+def test_duplicate_workspaces_are_searched_once(workspaces):
+    manuals, tickets = workspaces
+
+    once = search_workspaces([manuals, tickets], "pump", [0.6, 0.8], 10, "hybrid")
+    twice = search_workspaces([manuals, tickets, manuals], "pump", [0.6, 0.8], 10, "hybrid")
+
+    chunk_ids = [result.metadata["chunk_id"] for result in twice]
+    assert len(chunk_ids) == len(set(chunk_ids))
+    assert [(r.metadata["chunk_id"], r.similarity_score) for r in once] == \
+        [(r.metadata["chunk_id"], r.similarity_score) for r in twice]
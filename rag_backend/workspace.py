@@ -0,0 +1,206 @@
+import re
+import threading
+from concurrent.futures import Executor
+from typing import List, Dict, Tuple, Optional, Callable, Any
+from models import SearchResult
+from lexical_index import LexicalIndex, combine_statistics, reciprocal_rank_fusion
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKSPACE = "default"
+COLLECTION_PREFIX = "documents"
+WORKSPACE_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,46}[a-z0-9]$|^[a-z0-9]$")
+
+# A search hit: the workspace it came from, its chunk id and its score
+Hit = Tuple["Workspace", str, float]
+
+
+class WorkspaceNotFoundError(LookupError):
+    """Raised when a workspace is looked up that has never been created"""
+
+
+def validate_workspace_name(name: str):
+    """Raise ValueError unless name is usable as a workspace name"""
+    if not WORKSPACE_NAME_PATTERN.match(name):
+        raise ValueError(
+            f"Invalid workspace name '{name}': use 1-48 lowercase letters, digits, '-' or '_', "
+            "starting and ending with a letter or digit"
+        )
+
+
+def collection_name(workspace: str) -> str:
+    """Map a workspace name to its Chroma collection name"""
+    return COLLECTION_PREFIX if workspace == DEFAULT_WORKSPACE else f"{COLLECTION_PREFIX}_{workspace}"
+
+
+def workspace_name(collection: str) -> Optional[str]:
+    """Map a Chroma collection name back to its workspace, or None if it is not one"""
+    if collection == COLLECTION_PREFIX:
+        return DEFAULT_WORKSPACE
+    if collection.startswith(f"{COLLECTION_PREFIX}_"):
+        return collection[len(COLLECTION_PREFIX) + 1:]
+    return None
+
+
+def workspace_names(chroma_client) -> List[str]:
+    """List the names of all workspaces that have a collection"""
+    names = set()
+    for collection in chroma_client.list_collections():
+        name = workspace_name(collection.name)
+        if name is not None:
+            names.add(name)
+    return sorted(names)
+
+
+class Workspace:
+    """A tenant's Chroma collection together with its lexical index"""
+
+    def __init__(self, name: str, chroma_client):
+        self.name = name
+        self.collection_name = collection_name(name)
+        self.index_path = "./lexical_index" if name == DEFAULT_WORKSPACE else f"./lexical_index/workspaces/{name}"
+        self.collection = chroma_client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+        # Serializes chunk writes against clearing so Chroma and the index stay in step
+        self.write_lock = threading.Lock()
+
+        # Initialize BM25 index, rebuilding it from Chroma if it drifted out of sync
+        self.lexical_index = LexicalIndex(path=self.index_path)
+        if len(self.lexical_index) != self.collection.count():
+            self.rebuild_lexical_index()
+
+    def rebuild_lexical_index(self):
+        """Rebuild the lexical index from the chunks stored in Chroma"""
+        logger.info(f"Rebuilding lexical index for workspace '{self.name}' from vector database")
+        results = self.collection.get(include=["documents"])
+        self.lexical_index.clear()
+        self.lexical_index.add_chunks(results['ids'], results['documents'], persist=False)
+        self.lexical_index.compact()
+
+
+def _fan_out(targets: List[Workspace], search: Callable[[Workspace], Any],
+             executor: Optional[Executor] = None) -> List[Any]:
+    """Run search against every workspace, in parallel when there is more than one"""
+    if executor is None or len(targets) == 1:
+        return [search(target) for target in targets]
+    futures = [executor.submit(search, target) for target in targets]
+    return [future.result() for future in futures]
+
+
+def _vector_query(workspace: Workspace, query_embedding: List[float],
+                  n_results: int) -> List[Tuple[str, SearchResult]]:
+    """Query a workspace's collection and return (chunk_id, result) pairs, best match first"""
+    results = workspace.collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_results
+    )
+
+    search_results = []
+    if results['documents'] and results['documents'][0]:
+        for i in range(len(results['documents'][0])):
+            metadata = results['metadatas'][0][i]
+            metadata.setdefault("workspace", workspace.name)
+            search_results.append((results['ids'][0][i], SearchResult(
+                content=results['documents'][0][i],
+                metadata=metadata,
+                similarity_score=1 - results['distances'][0][i]  # Convert distance to similarity
+            )))
+
+    return search_results
+
+
+def vector_hits(targets: List[Workspace], query_embedding: List[float], n_results: int,
+                executor: Optional[Executor] = None) -> Dict[Tuple[str, str], SearchResult]:
+    """Top results by cosine similarity across workspaces, keyed by (workspace, chunk_id)"""
+    rankings = _fan_out(
+        targets, lambda target: _vector_query(target, query_embedding, n_results), executor
+    )
+    merged = [
+        ((target.name, chunk_id), result)
+        for target, ranking in zip(targets, rankings)
+        for chunk_id, result in ranking
+    ]
+    merged.sort(key=lambda item: item[1].similarity_score, reverse=True)
+    return dict(merged[:n_results])
+
+
+def lexical_hits(targets: List[Workspace], query: str, n_results: int,
+                 executor: Optional[Executor] = None) -> List[Hit]:
+    """Top BM25 hits across workspaces, scored against their combined statistics"""
+    statistics = combine_statistics(target.lexical_index.statistics(query) for target in targets)
+    if not statistics.num_chunks:
+        return []
+    rankings = _fan_out(
+        targets, lambda target: target.lexical_index.search(query, n_results, statistics=statistics), executor
+    )
+    merged = [
+        (target, chunk_id, score)
+        for target, ranking in zip(targets, rankings)
+        for chunk_id, score in ranking
+    ]
+    merged.sort(key=lambda hit: hit[2], reverse=True)
+    return merged[:n_results]
+
+
+def fetch_results(hits: List[Hit], known: Dict[Tuple[str, str], SearchResult] = None) -> List[SearchResult]:
+    """Build results for hits, loading from Chroma only chunks not already known"""
+    chunks = {key: (result.content, result.metadata) for key, result in (known or {}).items()}
+
+    missing: Dict[str, Tuple[Workspace, List[str]]] = {}
+    for workspace, chunk_id, _ in hits:
+        if (workspace.name, chunk_id) not in chunks:
+            missing.setdefault(workspace.name, (workspace, []))[1].append(chunk_id)
+    for workspace, chunk_ids in missing.values():
+        results = workspace.collection.get(ids=chunk_ids)
+        for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas']):
+            metadata.setdefault("workspace", workspace.name)
+            chunks[(workspace.name, chunk_id)] = (document, metadata)
+
+    search_results = []
+    for workspace, chunk_id, score in hits:
+        key = (workspace.name, chunk_id)
+        if key in chunks:
+            document, metadata = chunks[key]
+            search_results.append(SearchResult(
+                content=document,
+                metadata=metadata,
+                similarity_score=score
+            ))
+
+    return search_results
+
+
+def search_workspaces(targets: List[Workspace], query: str, query_embedding: Optional[List[float]],
+                      n_results: int, search_mode: str,
+                      executor: Optional[Executor] = None) -> List[SearchResult]:
+    """Search one or more workspaces and return the top n_results across all of them
+
+    Scores mean the same thing however many workspaces are searched: cosine
+    similarity in "vector" mode, BM25 over the workspaces' combined
+    statistics in "lexical" mode and reciprocal rank fusion of those two
+    merged rankings in "hybrid" mode.
+    """
+    # Searching a workspace twice would duplicate its hits and skew BM25 statistics
+    targets = list({target.name: target for target in targets}.values())
+
+    if search_mode == "lexical":
+        return fetch_results(lexical_hits(targets, query, n_results, executor))
+
+    if search_mode == "hybrid":
+        # Over-fetch from both retrievers so fusion has candidates to reorder
+        candidates = n_results * 4
+        lexical = lexical_hits(targets, query, candidates, executor)
+        vector = vector_hits(targets, query_embedding, candidates, executor)
+        by_name = {target.name: target for target in targets}
+        fused = reciprocal_rank_fusion([
+            [(workspace.name, chunk_id) for workspace, chunk_id, _ in lexical],
+            list(vector)
+        ])[:n_results]
+        hits = [(by_name[name], chunk_id, score) for (name, chunk_id), score in fused]
+        return fetch_results(hits, known=vector)
+
+    return list(vector_hits(targets, query_embedding, n_results, executor).values())